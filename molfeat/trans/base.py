@@ -745,7 +745,7 @@ class PrecomputedMolTransformer(MoleculeTransformer):
 
         # Set the length of the featurizer
         if len(self.cache) > 0:
-            self.length = len(list(self.cache.values())[0])
+            self.length = len(next(iter(self.cache.values())))
         elif self.base_featurizer is not None:
             self.length = len(self.base_featurizer)
         else:
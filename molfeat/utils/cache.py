@@ -4,12 +4,14 @@ from typing import Union
 from typing import Optional
 from typing import Callable
 from typing import Mapping
+from typing import MutableMapping
 
 import ast
 import abc
 import atexit
 import copy
 import glob
+import hashlib
 import pathlib
 import uuid
 import shelve
@@ -19,18 +21,83 @@ import os
 import fsspec
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import datamol as dm
 import joblib
 import itertools
-import random
-import multiprocessing as mp
-
-import pandas.errors
+import pickle
+import re
+import threading
+import zlib
+import weakref
 
+from collections import OrderedDict
 from functools import partial
+from multiprocessing.managers import DictProxy
+from multiprocessing.managers import SyncManager
 from rdkit.Chem import rdchem
 from molfeat.utils import commons
 from molfeat.utils import datatype
+from molfeat.utils import requires
+
+if requires.check("lmdb"):
+    import lmdb
+
+if requires.check("xxhash"):
+    import xxhash
+
+
+def xxh3_key(mol: Union[rdchem.Mol, str]):
+    """Hash the canonical isomeric smiles of a molecule with the 64 bits xxh3 function.
+
+    xxh3 is not a cryptographic hash, but it is much faster than the inchikey-based hashes.
+    Its collision probability remains about 3e-8 for a million different molecules.
+    Like `dm.unique_id` and unlike `dm.to_inchikey`, different tautomers of a molecule
+    get different keys.
+
+    Args:
+        mol: input molecule
+    """
+    if not requires.check("xxhash"):
+        raise ImportError("Cannot import `xxhash`, please install it with `pip install xxhash`")
+    if isinstance(mol, str):
+        mol = dm.to_mol(mol)
+    if mol is None:
+        return None
+    smiles = dm.to_smiles(mol, canonical=True, isomeric=True)
+    if smiles is None:
+        return None
+    return xxhash.xxh3_64_hexdigest(smiles.encode())
+
+
+_MISSING = object()
+
+# largest block size accepted by the pyarrow csv reader
+_MAX_CSV_BLOCK_SIZE = (1 << 31) - 1
+
+# keys produced by the supported hash functions: InChIKeys and hex digests
+_DIGEST_LENGTHS = frozenset([16, 27, 32, 40, 64])
+_DIGEST_PATTERN = re.compile(r"[A-Z]{14}-[A-Z]{10}-[A-Z]|[0-9a-f]+")
+# characters that cannot appear outside of brackets in a smiles
+_NON_SMILES_CHARS = re.compile(r"[adefADEGHJ-MQRT-Z]")
+
+
+def _is_digest(key: str):
+    """Check whether a string is already a molecular key rather than a smiles.
+    Strings that look like a digest but could still be parsed as a smiles
+    (e.g. hex digests made of `c`, `b` and ring closure digits) are not considered keys.
+
+    Args:
+        key: input string to check
+    """
+    return (
+        len(key) in _DIGEST_LENGTHS
+        and _DIGEST_PATTERN.fullmatch(key) is not None
+        and _NON_SMILES_CHARS.search(key) is not None
+    )
 
 
 class MolToKey:
@@ -39,11 +106,21 @@ class MolToKey:
     SUPPORTED_HASH_FN = {
         "dm.unique_id": dm.unique_id,
         "dm.to_inchikey": dm.to_inchikey,
+        "xxh3": xxh3_key,
     }
 
+    # minimum number of molecules before hashing is dispatched to parallel workers
+    PARALLEL_THRESHOLD = 2048
+
+    __slots__ = ("_hash_fn", "_hash_name", "_fast_call")
+
     def __init__(self, hash_fn: Optional[Union[Callable, str]] = "dm.unique_id"):
         """Init function for molecular key generator.
 
+        !!! note
+            MolToKey objects are immutable once created, so they can be shared
+            between caches and across calls without being copied.
+
         Args:
             hash_fn: hash function to use for the molecular key
         """
@@ -54,17 +131,87 @@ class MolToKey:
                     f"Hash function {hash_fn} is not supported. "
                     f"Supported hash functions are: {self.SUPPORTED_HASH_FN.keys()}"
                 )
+            if hash_fn == "xxh3" and not requires.check("xxhash"):
+                raise ImportError(
+                    "Cannot import `xxhash`, please install it with `pip install xxhash`"
+                )
+            hash_name = hash_fn
+            hash_fn = self.SUPPORTED_HASH_FN[hash_fn]
 
-            self.hash_name = hash_fn
-            self.hash_fn = self.SUPPORTED_HASH_FN[hash_fn]
+        elif hash_fn is None:
+            hash_fn = dm.unique_id
+            hash_name = "dm.unique_id"
 
         else:
-            self.hash_fn = hash_fn
-            self.hash_name = None
+            hash_name = None
 
-            if self.hash_fn is None:
-                self.hash_fn = dm.unique_id
-                self.hash_name = "dm.unique_id"
+        object.__setattr__(self, "_hash_fn", hash_fn)
+        object.__setattr__(self, "_hash_name", hash_name)
+        object.__setattr__(self, "_fast_call", self._build_fast_call(hash_fn, hash_name))
+
+    @staticmethod
+    def _build_fast_call(hash_fn: Callable, hash_name: Optional[str]):
+        """Build the function computing the key of a single molecule, with the hash function
+        bound as a local so the per-molecule path does not go through attribute lookups.
+
+        Args:
+            hash_fn: hash function to use for the molecular key
+            hash_name: name of the hash function if it's a supported one
+        """
+        _Mol = rdchem.Mol
+        _str = str
+
+        if hash_name is not None:
+            # supported hash functions are given the parsed molecule so it's not parsed twice
+            def _fast_call(mol):
+                if isinstance(mol, _Mol):
+                    return hash_fn(mol)
+                # already hashed inputs are returned without trying to parse them
+                if mol.__class__ is _str and _is_digest(mol):
+                    return mol
+                parsed_mol = dm.to_mol(mol)
+                if parsed_mol is None:
+                    return mol
+                return hash_fn(parsed_mol)
+
+        else:
+
+            def _fast_call(mol):
+                if not isinstance(mol, _Mol):
+                    if mol.__class__ is _str and _is_digest(mol):
+                        return mol
+                    if dm.to_mol(mol) is None:
+                        return mol
+                return hash_fn(mol)
+
+        return _fast_call
+
+    @property
+    def hash_fn(self):
+        """Hash function used to compute the molecular keys"""
+        return self._hash_fn
+
+    @property
+    def hash_name(self):
+        """Name of the hash function, None if a custom function was provided"""
+        return self._hash_name
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} objects are immutable")
+
+    def __getstate__(self):
+        return {"hash_fn": self._hash_fn, "hash_name": self._hash_name}
+
+    def __setstate__(self, state):
+        # state pickled before MolToKey used slots has the same keys in its __dict__
+        object.__setattr__(self, "_hash_fn", state["hash_fn"])
+        object.__setattr__(self, "_hash_name", state["hash_name"])
+        object.__setattr__(
+            self, "_fast_call", self._build_fast_call(state["hash_fn"], state["hash_name"])
+        )
 
     def __call__(self, mol: rdchem.Mol):
         """Convert a molecule object to a key that can be used for the cache system
@@ -72,12 +219,37 @@ class MolToKey:
         Args:
             mol: input molecule object
         """
-        is_mol = dm.to_mol(mol) is not None
+        return self._fast_call(mol)
 
-        if is_mol and self.hash_fn is not None:
-            return self.hash_fn(mol)
+    def batch(
+        self,
+        mols: List[Union[rdchem.Mol, str]],
+        n_jobs: Optional[int] = None,
+        progress: bool = False,
+    ):
+        """Convert a list of molecules to keys.
 
-        return mol
+        Hashing is done in-process unless the list is large enough for the
+        parallel workers to be worth their dispatch overhead.
+
+        Args:
+            mols: list of input molecules
+            n_jobs: number of parallel jobs to use for large inputs
+            progress: whether to show a progress bar
+        """
+        if not hasattr(mols, "__len__"):
+            mols = list(mols)
+        if n_jobs in (0, 1, None) or len(mols) < self.PARALLEL_THRESHOLD:
+            fast_call = self._fast_call
+            return [fast_call(mol) for mol in mols]
+        return dm.parallelized(
+            self,
+            mols,
+            n_jobs=n_jobs,
+            batch_size="auto",
+            progress=progress,
+            tqdm_kwargs=dict(leave=False),
+        )
 
     def to_state_dict(self):
         """Serialize MolToKey to a state dict."""
@@ -102,12 +274,16 @@ class _Cache(abc.ABC):
 
     """Implementation of a cache interface"""
 
+    # maximum number of string inputs whose molecular key is memoized
+    _STR_MEMO_SIZE = 100_000
+
     def __init__(
         self,
         mol_hasher: Optional[Union[Callable, str, MolToKey]] = None,
         name: Optional[str] = None,
         n_jobs: Optional[int] = -1,
         verbose: Union[bool, int] = False,
+        l1_size: int = 0,
     ):
         """
         Constructor for the Cache system
@@ -117,10 +293,13 @@ class _Cache(abc.ABC):
             name: name of the cache, will be autogenerated if not provided
             n_jobs: number of parallel jobs to use when performing any computation
             verbose: whether to print progress. Default to False
+            l1_size: maximum number of recently read values to keep in memory
+                when the cache is stored on disk. Use 0 to disable.
         """
         self.name = name or str(uuid.uuid4())
         self.n_jobs = n_jobs
         self.verbose = verbose
+        self.l1_size = l1_size
 
         if isinstance(mol_hasher, MolToKey):
             self.mol_hasher = mol_hasher
@@ -128,22 +307,155 @@ class _Cache(abc.ABC):
             self.mol_hasher = MolToKey(mol_hasher)
 
         self.cache = {}
+        self._l1 = OrderedDict()
+        self._init_hash_memo()
+
+    def _init_hash_memo(self):
+        """Initialize the memo of molecular keys already computed by this cache"""
+        self._mol_memo = weakref.WeakKeyDictionary()
+        self._str_memo = OrderedDict()
+
+    def __getstate__(self):
+        """Get the state for pickling, without the memo of molecular keys"""
+        state = self.__dict__.copy()
+        state.pop("_mol_memo", None)
+        state.pop("_str_memo", None)
+        return state
+
+    def __setstate__(self, state):
+        # caches pickled by older versions do not have the in-memory LRU cache
+        state.setdefault("l1_size", 0)
+        state.setdefault("_l1", OrderedDict())
+        self.__dict__.update(state)
+        self._init_hash_memo()
+
+    def _hash_mols(self, mols: List[Union[rdchem.Mol, str]]):
+        """Hash a list of molecules. Molecule objects and strings that were already hashed
+        by this cache are not hashed again, so molecule objects should not be modified in place
+        once they have been passed to the cache.
+
+        Args:
+            mols: list of molecules
+        """
+        if not hasattr(mols, "__len__"):
+            mols = list(mols)
+        mol_ids = [None] * len(mols)
+        pending = {}
+        for i, mol in enumerate(mols):
+            if isinstance(mol, rdchem.Mol):
+                mol_id = self._mol_memo.get(mol)
+            elif isinstance(mol, str):
+                mol_id = self._str_memo.get(mol)
+                if mol_id is not None:
+                    self._str_memo.move_to_end(mol)
+            else:
+                mol_id = None
+            if mol_id is None:
+                # keep the molecule itself, as inputs like pandas Series are not indexed by position
+                memo_key = mol if isinstance(mol, (rdchem.Mol, str)) else i
+                pending.setdefault(memo_key, (mol, []))[1].append(i)
+            else:
+                mol_ids[i] = mol_id
+
+        if len(pending) > 0:
+            pending_mols = [mol for mol, _ in pending.values()]
+            pending_ids = self.mol_hasher.batch(
+                pending_mols, n_jobs=self.n_jobs, progress=self.verbose
+            )
+            for (mol, indexes), mol_id in zip(pending.values(), pending_ids):
+                for i in indexes:
+                    mol_ids[i] = mol_id
+                if isinstance(mol, rdchem.Mol):
+                    self._mol_memo[mol] = mol_id
+                elif isinstance(mol, str):
+                    self._str_memo[mol] = mol_id
+            while len(self._str_memo) > self._STR_MEMO_SIZE:
+                self._str_memo.popitem(last=False)
+        return mol_ids
 
     def __getitem__(self, key):
-        key = self.mol_hasher(key)
-        return self.cache[key]
+        value = self._get_hashed(self.mol_hasher(key), _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def _get_hashed(self, key: Any, default: Optional[Any] = None):
+        """Get the cached value of an already hashed key. Values read from disk
+        are kept in a small in-memory LRU cache of size `l1_size`, and a copy is returned
+        on each read so that editing a returned value does not change later reads.
+
+        !!! note
+            HDF5 files with one dataset per key return lazy datasets rather than values
+            read from disk, so they do not go through the in-memory cache.
+
+        Args:
+            key: hashed key to get
+            default: default value to return when the key is not found
+        """
+        if self.l1_size <= 0 or not isinstance(self.cache, (shelve.Shelf, _LMDBStore, _HDF5Store)):
+            return self.cache.get(key, default)
+        try:
+            value = self._l1[key]
+            self._l1.move_to_end(key)
+            return copy.deepcopy(value)
+        except KeyError:
+            pass
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._l1[key] = copy.deepcopy(value)
+        if len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+        return value
+
+    def _delete_hashed(self, keys: Iterable[Any]):
+        """Delete already hashed keys from the cache
+
+        Args:
+            keys: hashed keys to delete
+        """
+        keys = list(keys)
+        self._invalidate_l1(keys)
+        for key in keys:
+            del self.cache[key]
+        self._sync_cache()
+
+    def _invalidate_l1(self, keys: Iterable[Any]):
+        """Remove already hashed keys from the in-memory LRU cache
+
+        Args:
+            keys: hashed keys to remove
+        """
+        if len(self._l1) > 0:
+            for key in keys:
+                self._l1.pop(key, None)
 
     def __contains__(self, key: Any):
         """Check whether a key is in the cache
         Args:
             key: key to check in the cache
         """
-        key = self.mol_hasher(key)
+        return self._contains_hashed(self.mol_hasher(key))
+
+    def _contains_hashed(self, key: Any):
+        """Check whether an already hashed key is in the cache
+
+        Args:
+            key: hashed key to check in the cache
+        """
         return key in self.cache
 
+    def _contains_many(self, keys: List[Any]):
+        """Check which of a list of already hashed keys are in the cache
+
+        Args:
+            keys: hashed keys to check in the cache
+        """
+        return [self._contains_hashed(key) for key in keys]
+
     def __len__(self):
         """Return the length of the cache"""
-        return len(self.keys())
+        return len(self.cache)
 
     def __iter__(self):
         """Iterate over the cache"""
@@ -181,20 +493,15 @@ class _Cache(abc.ABC):
             processed: list of computed features for input molecules
         """
 
-        converter = copy.deepcopy(self.mol_hasher)
-        mol_ids = dm.parallelized(
-            converter,
-            mols,
-            n_jobs=self.n_jobs,
-            progress=self.verbose,
-            tqdm_kwargs=dict(leave=False),
-        )
+        mol_ids = self._hash_mols(mols)
 
-        # only recompute on unseen ids
+        # only recompute on unseen ids, and only once for duplicated inputs
         unseen_ids = []
         mol_queries = []
-        for mol_id, m in zip(mol_ids, mols):
-            if mol_id not in self:
+        queued_ids = set()
+        for mol_id, m, is_cached in zip(mol_ids, mols, self._contains_many(mol_ids)):
+            if not is_cached and mol_id not in queued_ids:
+                queued_ids.add(mol_id)
                 unseen_ids.append(mol_id)
                 mol_queries.append(m)
         if len(mol_queries) > 0:
@@ -203,12 +510,12 @@ class _Cache(abc.ABC):
                 **transform_kwargs,
             )
             dtype = getattr(featurizer, "dtype", None)
-            if dtype is not None:
+            # skip the cast when the featurizer already returns the expected dtype
+            if dtype is not None and getattr(features, "dtype", None) != dtype:
                 features = datatype.cast(features, dtype=dtype)
-            for key, feat in zip(unseen_ids, features):
-                self[key] = feat
+            self.update(dict(zip(unseen_ids, features)))
             self._sync_cache()
-        return self.fetch(mols)
+        return self._fetch_by_ids(mol_ids)
 
     def clear(self, *args, **kwargs):
         ...
@@ -223,8 +530,7 @@ class _Cache(abc.ABC):
             key: key to get
             default: default value to return when the key is not found
         """
-        key = self.mol_hasher(key)
-        return self.cache.get(key, default)
+        return self._get_hashed(self.mol_hasher(key), default)
 
     def keys(self):
         """Get list of keys in the cache"""
@@ -245,6 +551,14 @@ class _Cache(abc.ABC):
     def _sync_cache(self):
         ...
 
+    def _fetch_by_ids(self, ids: List[Any]):
+        """Get the cached values for a list of already hashed keys
+
+        Args:
+            ids: hashed keys to fetch from the cache
+        """
+        return [self._get_hashed(mol_id) for mol_id in ids]
+
     def fetch(
         self,
         mols: List[Union[rdchem.Mol, str]],
@@ -257,15 +571,8 @@ class _Cache(abc.ABC):
         if isinstance(mols, str) or not isinstance(mols, Iterable):
             mols = [mols]
 
-        converter = copy.deepcopy(self.mol_hasher)
-        mol_ids = dm.parallelized(
-            converter,
-            mols,
-            n_jobs=self.n_jobs,
-            progress=self.verbose,
-            tqdm_kwargs=dict(leave=False),
-        )
-        return [self.get(mol_id) for mol_id in mol_ids]
+        mol_ids = self._hash_mols(mols)
+        return self._fetch_by_ids(mol_ids)
 
     @abc.abstractclassmethod
     def load_from_file(cls, filepath: Union[os.PathLike, str], **kwargs):
@@ -287,11 +594,142 @@ class _Cache(abc.ABC):
         ...
 
 
+class _LMDBStore(MutableMapping):
+    """Dict-like store of pickled values persisted in a LMDB file.
+    Keys are expected to be strings.
+    """
+
+    _PICKLE_PROTOCOL = 5
+
+    def __init__(self, path: Union[os.PathLike, str], map_size: int = 1 << 34):
+        """Open (or create) a LMDB file
+
+        Args:
+            path: path to the LMDB file
+            map_size: maximum size the database can grow to. The file is sparse, so this is not preallocated.
+        """
+        self.path = str(path)
+        self._env = lmdb.open(self.path, map_size=map_size, subdir=False)
+
+    def __getitem__(self, key: str):
+        with self._env.begin(buffers=True) as txn:
+            value = txn.get(key.encode())
+            if value is None:
+                raise KeyError(key)
+            return pickle.loads(value)
+
+    def __setitem__(self, key: str, value: Any):
+        self.update({key: value})
+
+    def __delitem__(self, key: str):
+        with self._env.begin(write=True) as txn:
+            if not txn.delete(key.encode()):
+                raise KeyError(key)
+
+    def __contains__(self, key: Any):
+        if not isinstance(key, str):
+            return False
+        with self._env.begin(buffers=True) as txn:
+            return txn.get(key.encode()) is not None
+
+    def __iter__(self):
+        with self._env.begin() as txn:
+            keys = [k.decode() for k in txn.cursor().iternext(keys=True, values=False)]
+        return iter(keys)
+
+    def __len__(self):
+        return self._env.stat()["entries"]
+
+    def update(self, new_items: Mapping[str, Any] = (), **kwargs):
+        """Write all the new items in a single transaction"""
+        items = new_items.items() if isinstance(new_items, Mapping) else new_items
+        with self._env.begin(write=True) as txn:
+            for k, v in itertools.chain(items, kwargs.items()):
+                txn.put(k.encode(), pickle.dumps(v, protocol=self._PICKLE_PROTOCOL))
+
+    def clear(self):
+        with self._env.begin(write=True) as txn:
+            txn.drop(self._env.open_db(txn=txn), delete=False)
+
+    def sync(self):
+        """Flush the data to disk. Transactions are already durable on commit"""
+        self._env.sync()
+
+    def close(self):
+        self._env.close()
+
+
+class _BloomFilter:
+    """In-memory probabilistic set of keys. A key that was never added is reported
+    as missing, except for rare false positives, and a key that was added is always
+    reported as present.
+    """
+
+    _BITS_PER_KEY = 10
+    # number of bits set per key, optimal for ~1% false positives at 10 bits per key
+    _N_HASHES = 7
+
+    def __init__(self, capacity: int, keys: Iterable[Any] = ()):
+        """Create an empty filter sized for a number of keys
+
+        Args:
+            capacity: number of keys the filter is sized for
+            keys: keys to add to the filter
+        """
+        self.capacity = max(int(capacity), 1024)
+        self._n_bits = self.capacity * self._BITS_PER_KEY
+        self._bits = np.zeros((self._n_bits + 7) // 8, dtype=np.uint8)
+        self.n_items = 0
+        self.update(keys)
+
+    def _positions(self, keys: List[Any]):
+        """Get the positions of the bits of a list of keys, using double hashing"""
+        # a digest instead of hash() since string hashes are salted per process,
+        # and the filter is pickled with its cache
+        digests = b"".join(hashlib.blake2b(str(k).encode(), digest_size=8).digest() for k in keys)
+        hashes = np.frombuffer(digests, dtype="<u8").astype(np.uint64)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self._N_HASHES, dtype=np.uint64)
+        return (h1[:, None] + steps * h2[:, None]) % np.uint64(self._n_bits)
+
+    def update(self, keys: Iterable[Any]):
+        """Add keys to the filter
+
+        Args:
+            keys: keys to add
+        """
+        keys = list(keys)
+        if len(keys) == 0:
+            return
+        positions = self._positions(keys).ravel()
+        masks = np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+        np.bitwise_or.at(self._bits, positions >> np.uint64(3), masks)
+        self.n_items += len(keys)
+
+    def contains_many(self, keys: List[Any]):
+        """Check which of a list of keys may have been added to the filter
+
+        Args:
+            keys: keys to check
+        """
+        if len(keys) == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        bits = (self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7))) & 1
+        return bits.all(axis=1)
+
+    def __contains__(self, key: Any):
+        return bool(self.contains_many([key])[0])
+
+
 class DataCache(_Cache):
     """
     Molecular features caching system that cache computed values in memory for reuse later
     """
 
+    SUPPORTED_BACKENDS = ["shelve", "lmdb"]
+
     def __init__(
         self,
         name: str,
@@ -301,6 +739,8 @@ class DataCache(_Cache):
         cache_file: Optional[Union[os.PathLike, bool]] = None,
         delete_on_exit: bool = False,
         clear_on_exit: bool = True,
+        backend: str = "shelve",
+        l1_size: int = 4096,
     ):
         """Precomputed fingerprint caching callback
 
@@ -312,8 +752,22 @@ class DataCache(_Cache):
             cache_file: Cache location. Defaults to None, which will use in-memory caching.
             delete_on_exit: Whether to delete the cache file on exit. Defaults to False.
             clear_on_exit: Whether to clear the cache on exit of the interpreter. Default to True
+            backend: Storage used for on-disk caching, one of "shelve" and "lmdb".
+                "lmdb" requires the `lmdb` package and writes each update in a single transaction.
+            l1_size: Maximum number of recently read values to keep in memory for on-disk caching.
         """
-        super().__init__(name=name, mol_hasher=mol_hasher, n_jobs=n_jobs, verbose=verbose)
+        super().__init__(
+            name=name, mol_hasher=mol_hasher, n_jobs=n_jobs, verbose=verbose, l1_size=l1_size
+        )
+        self._bloom = None
+
+        if backend not in DataCache.SUPPORTED_BACKENDS:
+            raise ValueError(
+                f"Unsupported backend, expected one of {DataCache.SUPPORTED_BACKENDS}, got '{backend}'"
+            )
+        if backend == "lmdb" and not requires.check("lmdb"):
+            raise ImportError("Cannot import `lmdb`, please install it with `pip install lmdb`")
+        self.backend = backend
 
         if cache_file is True:
             cache_file = pathlib.Path(
@@ -334,9 +788,31 @@ class DataCache(_Cache):
             # force creation of cache directory
             cache_parent = pathlib.Path(self.cache_file).parent
             cache_parent.mkdir(parents=True, exist_ok=True)
-            self.cache = shelve.open(self.cache_file)
+            if self.backend == "lmdb":
+                self.cache = _LMDBStore(self.cache_file)
+            else:
+                self.cache = shelve.open(self.cache_file)
+            self._build_bloom()
         else:
             self.cache = {}
+            self._bloom = None
+
+    def __setstate__(self, state):
+        # caches pickled by older versions do not have a backend nor a filter of their keys
+        state.setdefault("backend", "shelve")
+        state.setdefault("_bloom", None)
+        super().__setstate__(state)
+
+    def _build_bloom(self, capacity: Optional[int] = None):
+        """Build the filter of the keys of an on-disk cache, so most lookups of
+        missing keys are answered without reading the disk.
+
+        Args:
+            capacity: number of keys the filter is sized for. Defaults to 4 times the size of the cache.
+        """
+        if capacity is None:
+            capacity = max(4 * len(self.cache), 10_000)
+        self._bloom = _BloomFilter(capacity, keys=iter(self.cache))
 
     def clear(self, delete: bool = False):
         """Clear cache memory if needed.
@@ -345,12 +821,14 @@ class DataCache(_Cache):
         Args:
             delete: whether to delete the cache file if on disk
         """
+        self._l1.clear()
         self.cache.clear()
-        if isinstance(self.cache, shelve.Shelf):
+        if isinstance(self.cache, (shelve.Shelf, _LMDBStore)):
             self.cache.close()
             # EN: temporary set it to a dict before reopening
             # this needs to be done to prevent operating on close files
             self.cache = {}
+            self._bloom = None
         if delete:
             if self.cache_file is not None:
                 for path in glob.glob(str(self.cache_file) + "*"):
@@ -367,11 +845,48 @@ class DataCache(_Cache):
         Args:
             new_cache: new cache with items to use to update current cache
         """
-        for k, v in new_cache.items():
-            k = self.mol_hasher(k)
-            self.cache[k] = v
+        new_cache = {self.mol_hasher(k): v for k, v in new_cache.items()}
+        self._invalidate_l1(new_cache.keys())
+        self.cache.update(new_cache)
+        if self._bloom is not None:
+            if self._bloom.n_items + len(new_cache) > self._bloom.capacity:
+                self._build_bloom(capacity=2 * (len(self.cache) + len(new_cache)))
+            else:
+                self._bloom.update(new_cache.keys())
         return self
 
+    def _contains_hashed(self, key: Any):
+        """Check whether an already hashed key is in the cache
+
+        Args:
+            key: hashed key to check in the cache
+        """
+        if self._bloom is not None and key not in self._bloom:
+            return False
+        return key in self.cache
+
+    def _contains_many(self, keys: List[Any]):
+        """Check which of a list of already hashed keys are in the cache
+
+        Args:
+            keys: hashed keys to check in the cache
+        """
+        if self._bloom is None:
+            return super()._contains_many(keys)
+        maybe_present = self._bloom.contains_many(keys)
+        return [bool(maybe) and key in self.cache for key, maybe in zip(keys, maybe_present)]
+
+    def _get_hashed(self, key: Any, default: Optional[Any] = None):
+        """Get the cached value of an already hashed key
+
+        Args:
+            key: hashed key to get
+            default: default value to return when the key is not found
+        """
+        if self._bloom is not None and key not in self._bloom:
+            return default
+        return super()._get_hashed(key, default)
+
     def _sync_cache(self):
         """Perform a cache sync to ensure values are up to date"""
         if isinstance(self.cache, shelve.Shelf):
@@ -392,11 +907,13 @@ class DataCache(_Cache):
         new_cache.update(data)
         return new_cache
 
-    def save_to_file(self, filepath: Union[os.PathLike, str]):
+    def save_to_file(self, filepath: Union[os.PathLike, str], **kwargs):
         """Save the cache to a file
 
         Args:
             filepath: path to the file to save
+            kwargs: keyword arguments to pass to `joblib.dump`, e.g `compress=("lz4", 3)`
+                to compress the file. The compression is detected automatically when loading.
         """
         information = dict(
             name=self.name,
@@ -405,10 +922,72 @@ class DataCache(_Cache):
             verbose=self.verbose,
             cache_file=(self.cache_file is not None),
             delete_on_exit=self.delete_on_exit,
+            backend=self.backend,
+            l1_size=self.l1_size,
         )
         information["data"] = self.to_dict()
         with fsspec.open(filepath, "wb") as f:
-            joblib.dump(information, f)
+            joblib.dump(information, f, **kwargs)
+
+
+class _SharedDict(dict):
+    """Dict served by a multiprocessing manager, with bulk accessors
+    to query many keys in a single round trip.
+    """
+
+    def get_many(self, keys: List[Any], default: Optional[Any] = None):
+        return [self.get(k, default) for k in keys]
+
+    def contains_many(self, keys: List[Any]):
+        return [k in self for k in keys]
+
+
+class _SharedDictProxy(DictProxy):
+    """Proxy to a `_SharedDict` living in the manager process"""
+
+    _exposed_ = DictProxy._exposed_ + ("get_many", "contains_many")
+
+    def get_many(self, keys: List[Any], default: Optional[Any] = None):
+        return self._callmethod("get_many", (keys, default))
+
+    def contains_many(self, keys: List[Any]):
+        return self._callmethod("contains_many", (keys,))
+
+
+class _CacheManager(SyncManager):
+    """Multiprocessing manager that can serve `_SharedDict` objects"""
+
+
+_CacheManager.register("SharedDict", _SharedDict, _SharedDictProxy)
+
+_MANAGER = None
+_MANAGER_PID = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def _get_manager():
+    """Get the manager shared by all the `MPDataCache` of the current process,
+    starting its server process on first use.
+    """
+    global _MANAGER, _MANAGER_PID
+    with _MANAGER_LOCK:
+        # a forked child starts its own manager instead of the one owned by its parent
+        if _MANAGER is None or _MANAGER_PID != os.getpid():
+            _MANAGER = _CacheManager()
+            _MANAGER.start()
+            _MANAGER_PID = os.getpid()
+        return _MANAGER
+
+
+@atexit.register
+def _shutdown_manager():
+    """Shutdown the shared manager if it was started by the current process"""
+    global _MANAGER, _MANAGER_PID
+    with _MANAGER_LOCK:
+        if _MANAGER is not None and _MANAGER_PID == os.getpid():
+            _MANAGER.shutdown()
+        _MANAGER = None
+        _MANAGER_PID = None
 
 
 class MPDataCache(DataCache):
@@ -443,8 +1022,288 @@ class MPDataCache(DataCache):
 
     def _initialize_cache(self):
         """Initialize empty cache using a shared dict"""
-        manager = mp.Manager()  # this might not be a great idea to initialize everytime...
-        self.cache = manager.dict()
+        self.cache = _get_manager().SharedDict()
+
+    def _contains_many(self, keys: List[Any]):
+        """Check which of a list of already hashed keys are in the cache, in a single round trip
+
+        Args:
+            keys: hashed keys to check in the cache
+        """
+        return self.cache.contains_many(list(keys))
+
+    def _fetch_by_ids(self, ids: List[Any]):
+        """Get the cached values for a list of already hashed keys, in a single round trip
+
+        Args:
+            ids: hashed keys to fetch from the cache
+        """
+        return self.cache.get_many(list(ids))
+
+
+class _ArrayStore(MutableMapping):
+    """Dict-like store that keeps array values of the same shape and dtype as the rows
+    of a single contiguous array. Any other value is kept aside in a regular dict.
+    """
+
+    def __init__(self, keys: Iterable[Any], values: np.ndarray):
+        """Create a store from a list of keys and the array of their values
+
+        Args:
+            keys: list of keys
+            values: array whose rows are the values of each key
+        """
+        self._index = {k: i for i, k in enumerate(keys)}
+        self._values = values
+        self._n_rows = len(values)
+        self._others = {}
+
+    def _is_row(self, value: Any):
+        return (
+            isinstance(value, np.ndarray)
+            and value.shape == self._values.shape[1:]
+            and value.dtype == self._values.dtype
+        )
+
+    def __getitem__(self, key: Any):
+        idx = self._index.get(key)
+        if idx is None:
+            return self._others[key]
+        return self._values[idx]
+
+    def __setitem__(self, key: Any, value: Any):
+        if not self._is_row(value):
+            self._index.pop(key, None)
+            self._others[key] = value
+            return
+        self._others.pop(key, None)
+        idx = self._index.get(key)
+        if idx is None:
+            if self._n_rows == len(self._values):
+                # grow geometrically to keep appends amortized
+                values = np.empty(
+                    (max(2 * len(self._values), 16),) + self._values.shape[1:],
+                    dtype=self._values.dtype,
+                )
+                values[: self._n_rows] = self._values[: self._n_rows]
+                self._values = values
+            idx = self._n_rows
+            self._n_rows += 1
+            self._index[key] = idx
+        self._values[idx] = value
+
+    def __delitem__(self, key: Any):
+        # the row of a deleted key is simply left unused
+        if self._index.pop(key, None) is None:
+            del self._others[key]
+
+    def __contains__(self, key: Any):
+        return key in self._index or key in self._others
+
+    def __iter__(self):
+        return itertools.chain(self._index, self._others)
+
+    def __len__(self):
+        return len(self._index) + len(self._others)
+
+    def take(self, keys: List[Any], fill_value: Any = np.nan):
+        """Get the values of a list of keys as the rows of a single array, gathered in one pass.
+
+        Args:
+            keys: list of keys
+            fill_value: value of the rows of missing keys
+        """
+        idx = np.fromiter((self._index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+        found = idx >= 0
+        dtype = np.result_type(self._values.dtype, fill_value)
+        if found.all():
+            return self._values[idx].astype(dtype, copy=False)
+        out = np.full((len(keys),) + self._values.shape[1:], fill_value, dtype=dtype)
+        out[found] = self._values[idx[found]]
+        for i in np.flatnonzero(~found):
+            if keys[i] in self._others:
+                out[i] = self._others[keys[i]]
+        return out
+
+    def to_arrays(self):
+        """Get the keys and the array of values of the items stored as rows.
+        Items kept aside are not included.
+        """
+        keys = list(self._index.keys())
+        if len(keys) == self._n_rows:
+            # no row was left unused, so rows are in the same order as the keys
+            return keys, self._values[: self._n_rows]
+        return keys, self._values[list(self._index.values())]
+
+
+class _HDF5Store(MutableMapping):
+    """Dict-like store over a HDF5 file where all the values are rows of a single chunked
+    "values" dataset and their keys are in a "keys" dataset.
+
+    New items are buffered and appended in bulk. Values that do not match the shape and dtype
+    of the rows are written as individual datasets of the "others" group.
+    """
+
+    # target size in bytes of the chunks of the values dataset
+    _CHUNK_BYTES = 1 << 20
+
+    def __init__(self, h5file: h5py.File, flush_size: int = 4096):
+        """Open the store of a HDF5 file. Datasets are created on first write if they do not exist.
+
+        Args:
+            h5file: opened HDF5 file
+            flush_size: number of buffered items that triggers a write to the file
+        """
+        self.file = h5file
+        self.flush_size = flush_size
+        self._buffer = {}
+        self._keys = h5file.get("keys")
+        self._values = h5file.get("values")
+        self._index = {}
+        if self._keys is not None:
+            # deleted items have their key blanked
+            self._index = {k: i for i, k in enumerate(self._keys.asstr()[:]) if k}
+            if self._values.chunks is not None:
+                self._align_flush_size(self._values.chunks[0])
+
+    @staticmethod
+    def is_store(h5file: h5py.File):
+        """Check whether a HDF5 file uses the layout of this store, or is empty"""
+        if len(h5file) == 0:
+            return True
+        return isinstance(h5file.get("keys"), h5py.Dataset) and isinstance(
+            h5file.get("values"), h5py.Dataset
+        )
+
+    def _is_row(self, value: np.ndarray):
+        if self._values is None:
+            return value.dtype.kind in "biuf"
+        return value.shape == self._values.shape[1:] and value.dtype == self._values.dtype
+
+    def _align_flush_size(self, chunk_rows: int):
+        # flush whole chunks, so each chunk is compressed and written only once
+        self.flush_size = chunk_rows * max(self.flush_size // chunk_rows, 1)
+
+    def _create_datasets(self, row: np.ndarray):
+        chunk_rows = int(np.clip(self._CHUNK_BYTES // max(row.nbytes, 1), 1, self.flush_size))
+        self._align_flush_size(chunk_rows)
+        self._keys = self.file.create_dataset(
+            "keys", shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(), chunks=(chunk_rows,)
+        )
+        self._values = self.file.create_dataset(
+            "values",
+            shape=(0,) + row.shape,
+            maxshape=(None,) + row.shape,
+            dtype=row.dtype,
+            chunks=(chunk_rows,) + row.shape,
+            compression="lzf",
+        )
+
+    def flush(self):
+        """Append the buffered items to the file"""
+        if len(self._buffer) == 0:
+            return
+        keys = list(self._buffer.keys())
+        values = np.stack(list(self._buffer.values()))
+        n_rows = len(self._keys)
+        self._keys.resize((n_rows + len(keys),))
+        self._keys[n_rows:] = keys
+        self._values.resize(n_rows + len(keys), axis=0)
+        self._values[n_rows:] = values
+        self._index.update((k, n_rows + i) for i, k in enumerate(keys))
+        self._buffer.clear()
+
+    def take(self, keys: List[str], fill_value: Any = np.nan):
+        """Get the values of a list of keys as the rows of a single array.
+        Rows are read from the file in increasing order, in a single read when they are dense.
+
+        Args:
+            keys: list of keys
+            fill_value: value of the rows of missing keys
+        """
+        self.flush()
+        if self._values is None:
+            raise ValueError("The store has no rows, the shape of its values is unknown")
+        idx = np.fromiter((self._index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+        found = idx >= 0
+        out = np.full(
+            (len(keys),) + self._values.shape[1:],
+            fill_value,
+            dtype=np.result_type(self._values.dtype, fill_value),
+        )
+        if found.any():
+            rows, inverse = np.unique(idx[found], return_inverse=True)
+            start, stop = rows[0], rows[-1] + 1
+            if 2 * len(rows) >= stop - start:
+                values = self._values[start:stop][rows - start]
+            else:
+                values = self._values[rows]
+            out[found] = values[inverse]
+        if "others" in self.file:
+            others = self.file["others"]
+            for i in np.flatnonzero(~found):
+                if keys[i] in others:
+                    out[i] = others[keys[i]][()]
+        return out
+
+    def __getitem__(self, key: str):
+        idx = self._index.get(key)
+        if idx is not None:
+            return self._values[idx]
+        if key in self._buffer:
+            return self._buffer[key]
+        if "others" in self.file and key in self.file["others"]:
+            return self.file["others"][key][()]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        value = np.asarray(value)
+        if not self._is_row(value):
+            self.pop(key, None)
+            self.file.require_group("others").create_dataset(key, data=value)
+            return
+        if "others" in self.file and key in self.file["others"]:
+            del self.file["others"][key]
+        idx = self._index.get(key)
+        if idx is not None:
+            self._values[idx] = value
+            return
+        if self._values is None:
+            self._create_datasets(value)
+        self._buffer[key] = value
+        if len(self._buffer) >= self.flush_size:
+            self.flush()
+
+    def __delitem__(self, key: str):
+        idx = self._index.pop(key, None)
+        if idx is not None:
+            self._keys[idx] = ""
+        elif key in self._buffer:
+            del self._buffer[key]
+        elif "others" in self.file and key in self.file["others"]:
+            del self.file["others"][key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: Any):
+        return (
+            key in self._index
+            or key in self._buffer
+            or ("others" in self.file and key in self.file["others"])
+        )
+
+    def __iter__(self):
+        others = self.file["others"].keys() if "others" in self.file else []
+        return itertools.chain(list(self._index), list(self._buffer), list(others))
+
+    def __len__(self):
+        n_others = len(self.file["others"]) if "others" in self.file else 0
+        return len(self._index) + len(self._buffer) + n_others
+
+    def close(self):
+        """Write any buffered item and close the file"""
+        self.flush()
+        self.file.close()
 
 
 class FileCache(_Cache):
@@ -453,6 +1312,8 @@ class FileCache(_Cache):
 
     The convention used requires the 'keys' and  'values' columns when
     the input file needs to be loaded as a dataframe.
+    HDF5 files hold the values as rows of a single 'values' dataset, with their 'keys' in a
+    separate dataset. Files with one dataset per key can still be loaded.
     """
 
     _PICKLE_PROTOCOL = 4
@@ -468,6 +1329,7 @@ class FileCache(_Cache):
         file_type: str = "parquet",
         clear_on_exit: bool = True,
         parquet_kwargs: Optional[Dict[Any, Any]] = None,
+        l1_size: int = 4096,
     ):
         """Precomputed fingerprint caching callback
 
@@ -484,9 +1346,12 @@ class FileCache(_Cache):
             file_type: File type that was provided. One of "csv", "pickle", "hdf5" and "parquet"
                 For "csv" and "parquet", we expect columns "keys" and "values"
                 For a pickle, we expect either a mapping or a dataframe with "keys" and "values" columns
-            parquet_kwargs: Argument to pass to the parquet reader.
+            parquet_kwargs: Argument to pass to the parquet reader (`pyarrow.parquet.read_table`).
+            l1_size: Maximum number of recently read values to keep in memory for hdf5 files.
         """
-        super().__init__(name=name, mol_hasher=mol_hasher, n_jobs=n_jobs, verbose=verbose)
+        super().__init__(
+            name=name, mol_hasher=mol_hasher, n_jobs=n_jobs, verbose=verbose, l1_size=l1_size
+        )
 
         self.cache_file = cache_file
         self.file_type = file_type
@@ -510,7 +1375,8 @@ class FileCache(_Cache):
         """Clear cache memory at exit and close any open file
         Note that a cleared cache cannot be used anymore !
         """
-        if self.file_type in ["hdf5", "h5"]:
+        self._l1.clear()
+        if isinstance(self.cache, (h5py.File, _HDF5Store)):
             self.cache.close()
         else:
             del self.cache
@@ -519,7 +1385,7 @@ class FileCache(_Cache):
 
     def items(self):
         """Return iterator of key, values in the cache"""
-        if self.file_type in ["hdf5", "h5"]:
+        if isinstance(self.cache, h5py.File):
             return ((k, np.asarray(v)) for k, v in self.cache.items())
         return super().items()
 
@@ -531,6 +1397,9 @@ class FileCache(_Cache):
         if self.file_type in ["hdf5", "h5"]:
             f = fsspec.open("simplecache::" + self.cache_file, "rb+").open()
             self.cache = h5py.File(f, "r+")
+            # files with one dataset per key are still supported
+            if _HDF5Store.is_store(self.cache):
+                self.cache = _HDF5Store(self.cache)
 
         elif not file_exists:
             self.cache = {}
@@ -540,26 +1409,148 @@ class FileCache(_Cache):
                 self.cache = joblib.load(IN)
 
         elif self.file_type == "csv":
-            with fsspec.open(self.cache_file, "rb") as IN:
-                # Allow the CSV file to exist but with an empty content
-                try:
-                    self.cache = pd.read_csv(
-                        IN,
-                        converters={"values": lambda x: commons.unpack_bits(ast.literal_eval(x))},
+            table = self._read_csv_table(self.cache_file)
+            # Allow the CSV file to exist but with an empty content
+            if table is None:
+                self.cache = {}
+            else:
+                values = table.column("values").to_pylist()
+                if len(values) > 0 and values[0][:2] in ("b'", 'b"'):
+                    # older files hold the python representation of the packed bytes
+                    values = [ast.literal_eval(x) for x in values]
+                self.cache = dict(
+                    zip(
+                        table.column("keys").to_pylist(),
+                        [commons.unpack_bits(x) for x in values],
                     )
-                except pandas.errors.EmptyDataError:
-                    self.cache = {}
+                )
 
         elif self.file_type in ["parquet", "pq"]:
-            self.cache = pd.read_parquet(
-                self.cache_file,
+            fs, path = fsspec.core.url_to_fs(self.cache_file)
+            table = pq.read_table(
+                path,
+                filesystem=fs,
                 columns=["keys", "values"],
                 **self.parquet_kwargs,
             )
+            self.cache = self._table_to_cache(table)
+
         # convert dataframe to dict if needed
         if isinstance(self.cache, pd.DataFrame):
             self.cache = self.cache.set_index("keys").to_dict()["values"]
 
+        if type(self.cache) is dict:
+            self.cache = self._dict_to_cache(self.cache)
+
+    @staticmethod
+    def _read_csv_table(cache_file: str):
+        """Read the "keys" and "values" columns of a csv file as an arrow table.
+        Returns None if the file is empty.
+
+        Args:
+            cache_file: path to the csv file
+        """
+        # rows must fit in a single block, so the block size grows until the largest one fits
+        block_size = 1 << 20
+        while True:
+            with fsspec.open(cache_file, "rb") as IN:
+                try:
+                    return pa_csv.read_csv(
+                        IN,
+                        read_options=pa_csv.ReadOptions(block_size=block_size),
+                        convert_options=pa_csv.ConvertOptions(
+                            column_types={"keys": pa.string(), "values": pa.string()},
+                            include_columns=["keys", "values"],
+                        ),
+                    )
+                except pa.ArrowInvalid as e:
+                    if str(e).startswith("Empty CSV file"):
+                        return None
+                    if "straddling" not in str(e) or block_size >= _MAX_CSV_BLOCK_SIZE:
+                        raise
+            block_size = min(16 * block_size, _MAX_CSV_BLOCK_SIZE)
+
+    @staticmethod
+    def _stack_values(values: List[Any]):
+        """Stack a list of numerical 1D arrays of the same length and dtype into a 2D array.
+        Returns None if the values cannot be stacked.
+
+        Args:
+            values: list of values to stack
+        """
+        if len(values) > 0 and all(
+            isinstance(v, np.ndarray)
+            and v.ndim == 1
+            and v.dtype.kind in "biuf"
+            and v.shape == values[0].shape
+            and v.dtype == values[0].dtype
+            for v in values
+        ):
+            return np.stack(values)
+        return None
+
+    @staticmethod
+    def _dict_to_cache(data: Dict[Any, Any]):
+        """Convert a dict of values to a cache mapping.
+        Numerical values of the same length are loaded as a single contiguous array.
+
+        Args:
+            data: input dict of values
+        """
+        values = FileCache._stack_values(list(data.values()))
+        if values is None:
+            return data
+        return _ArrayStore(list(data.keys()), values)
+
+    @staticmethod
+    def _table_to_cache(table: pa.Table):
+        """Convert an arrow table with "keys" and "values" columns to a cache mapping.
+        Numerical values of the same length are loaded as a single contiguous array.
+
+        Args:
+            table: input arrow table
+        """
+        keys = table.column("keys").to_pylist()
+        values = table.column("values").combine_chunks()
+        value_type = values.type
+        if (
+            len(values) > 0
+            and values.null_count == 0
+            and (
+                pa.types.is_list(value_type)
+                or pa.types.is_large_list(value_type)
+                or pa.types.is_fixed_size_list(value_type)
+            )
+            and (
+                pa.types.is_integer(value_type.value_type)
+                or pa.types.is_floating(value_type.value_type)
+                or pa.types.is_boolean(value_type.value_type)
+            )
+        ):
+            lengths = pc.min_max(pc.list_value_length(values)).as_py()
+            flat_values = values.flatten()
+            if lengths["min"] == lengths["max"] and flat_values.null_count == 0:
+                flat_values = flat_values.to_numpy(zero_copy_only=False)
+                return _ArrayStore(keys, flat_values.reshape(len(values), -1))
+        # any other type of values goes through pandas, as with a dataframe
+        return dict(zip(keys, table.column("values").to_pandas()))
+
+    def _to_table(self):
+        """Convert the cache to an arrow table with "keys" and "values" columns.
+        Numerical values of the same length are written as fixed size lists, which can be
+        loaded back as a single contiguous array.
+        """
+        if isinstance(self.cache, _ArrayStore) and len(self.cache._others) == 0:
+            keys, values = self.cache.to_arrays()
+        else:
+            items = list(self.items())
+            keys = [k for k, _ in items]
+            values = self._stack_values([v for _, v in items])
+            if values is None:
+                return pa.Table.from_pandas(self.to_dataframe(), preserve_index=False)
+        values = pa.FixedSizeListArray.from_arrays(pa.array(values.reshape(-1)), values.shape[1])
+        return pa.table({"keys": pa.array(keys, type=pa.large_string()), "values": values})
+
     def update(self, new_cache: Mapping[Any, Any]):
         """Update the cache with new values
 
@@ -568,12 +1559,54 @@ class FileCache(_Cache):
         """
         for k, v in new_cache.items():
             key = self.mol_hasher(k)
-            if self.file_type in ["hdf5", "h5"]:
+            self._invalidate_l1([key])
+            if isinstance(self.cache, h5py.File):
                 self.cache.create_dataset(key, data=v)
             else:
                 self.cache[key] = v
         return self
 
+    def _sync_cache(self):
+        """Write any buffered value to the HDF5 file"""
+        if isinstance(self.cache, _HDF5Store):
+            self.cache.flush()
+
+    def fetch_array(
+        self,
+        mols: List[Union[rdchem.Mol, str]],
+        fill_value: Any = np.nan,
+    ):
+        """Get the representation of a list of molecules as the rows of a single array.
+        Values stored as a single contiguous array are gathered at once instead of one by one.
+
+        Args:
+            mols: list of molecules
+            fill_value: value of the rows of molecules that are not in the cache.
+                The array is cast to a dtype that can hold it.
+        """
+        if isinstance(mols, str) or not isinstance(mols, Iterable):
+            mols = [mols]
+
+        mol_ids = self._hash_mols(mols)
+        if isinstance(self.cache, (_ArrayStore, _HDF5Store)):
+            return self.cache.take(mol_ids, fill_value=fill_value)
+
+        values = self._fetch_by_ids(mol_ids)
+        template = next((np.asarray(v) for v in values if v is not None), None)
+        if template is None:
+            raise ValueError(
+                "None of the molecules are in the cache, the shape of their values is unknown"
+            )
+        out = np.full(
+            (len(values),) + template.shape,
+            fill_value,
+            dtype=np.result_type(template.dtype, fill_value),
+        )
+        for i, value in enumerate(values):
+            if value is not None:
+                out[i] = value
+        return out
+
     @classmethod
     def load_from_file(cls, filepath: Union[os.PathLike, str], **kwargs):
         """Load a FileCache from a file
@@ -613,7 +1646,7 @@ class FileCache(_Cache):
             filepath: path to the file to save. If None, the cache is saved to the original file.
             file_type: format used to save the cache to file one of "pickle", "csv", "hdf5", "parquet".
                 If None, the original file type is used.
-            kwargs: keyword arguments to pass to the serializer to disk (e.g to pass to pd.to_csv or pd.to_parquet)
+            kwargs: keyword arguments to pass to the serializer to disk (e.g to pass to joblib.dump, pd.to_csv or pq.write_table)
         """
 
         if filepath is None:
@@ -624,22 +1657,32 @@ class FileCache(_Cache):
 
         if file_type in ["pkl", "pickle"]:
             with fsspec.open(filepath, "wb") as f:
-                joblib.dump(self.to_dict(), f)
-
-        elif file_type in ["csv", "parquet", "pq"]:
-            df = self.to_dataframe(pack_bits=(file_type == "csv"))
+                joblib.dump(self.to_dict(), f, **kwargs)
+
+        elif file_type == "csv":
+            # values are packed as base64 strings so they can be decoded without parsing
+            df = pd.DataFrame(
+                [
+                    (k, commons.pack_bits(x, protocol=self._PICKLE_PROTOCOL, b64=True))
+                    for k, x in self.items()
+                ],
+                columns=["keys", "values"],
+            )
+            with fsspec.open(filepath, "w") as f:
+                df.to_csv(f, index=False, **kwargs)
 
-            if file_type == "csv":
-                with fsspec.open(filepath, "w") as f:
-                    df.to_csv(f, index=False, **kwargs)
-            else:
-                df.to_parquet(filepath, index=False, **kwargs)
+        elif file_type in ["parquet", "pq"]:
+            fs, path = fsspec.core.url_to_fs(filepath)
+            pq.write_table(self._to_table(), path, filesystem=fs, **kwargs)
 
         elif file_type in ["hdf5", "h5"]:
             with fsspec.open(filepath, "wb") as IN:
                 with h5py.File(IN, "w") as f:
-                    for k, v in self.items():
-                        f.create_dataset(k, data=v)
+                    # values are streamed in chunk-aligned blocks to bound memory usage.
+                    # Writing from several threads would not help since h5py serializes all calls.
+                    store = _HDF5Store(f)
+                    store.update(self.items())
+                    store.flush()
         else:
             raise ValueError("Unsupported output protocol: {}".format(file_type))
 
@@ -686,24 +1729,90 @@ class FileCache(_Cache):
 
 
 class CacheList:
-    """Proxy for supporting search using a list of cache"""
+    """Proxy for supporting search using a list of cache
+
+    New items are routed to a single cache based on their molecular key, so each key
+    is written to exactly one cache and is looked up there first.
+    """
 
     def __init__(self, *caches):
         self.caches = caches
 
+    def _hash_key(self, key: Any):
+        """Hash a key with the molecule hasher of the first cache
+
+        Args:
+            key: input key to hash
+        """
+        mol_hasher = getattr(self.caches[0], "mol_hasher", None)
+        if mol_hasher is not None:
+            key = mol_hasher(key)
+        return key
+
+    def _shares_hasher(self, cache: Any):
+        """Check whether a cache hashes keys the same way as the first cache,
+        so it can be queried with keys that are already hashed
+
+        Args:
+            cache: cache to check
+        """
+        mol_hasher = getattr(self.caches[0], "mol_hasher", None)
+        return (
+            isinstance(cache, _Cache)
+            and isinstance(mol_hasher, MolToKey)
+            and cache.mol_hasher.hash_fn is mol_hasher.hash_fn
+        )
+
+    def _hashed_shard_index(self, key: Any):
+        """Get the index of the cache an already hashed key is routed to
+
+        Args:
+            key: hashed key to route
+        """
+        # crc32 instead of hash() since string hashes are salted per process
+        return zlib.crc32(str(key).encode()) % len(self.caches)
+
+    def _shard_index(self, key: Any):
+        """Get the index of the cache a key is routed to
+
+        Args:
+            key: input key to route
+        """
+        return self._hashed_shard_index(self._hash_key(key))
+
+    def _lookup_order(self, hashed_key: Any):
+        """Get the caches in the order they should be searched for a key: the cache the key
+        is routed to first, then the others since items that were not added through
+        the cache list can be in any cache.
+
+        Args:
+            hashed_key: hashed key to look up
+        """
+        shard_index = self._hashed_shard_index(hashed_key)
+        yield self.caches[shard_index]
+        for i, cache in enumerate(self.caches):
+            if i != shard_index:
+                yield cache
+
     def __getitem__(self, key):
-        for cache in self.caches:
-            val = cache.get(key)
-            if val is not None:
-                return val
-        raise KeyError(f"{key} not found in any cache")
+        val = self.get(key)
+        if val is None:
+            raise KeyError(f"{key} not found in any cache")
+        return val
 
     def __contains__(self, key: Any):
         """Check whether a key is in the cache
         Args:
             key: key to check in the cache
         """
-        return any(key in cache for cache in self.caches)
+        hashed_key = self._hash_key(key)
+        for cache in self._lookup_order(hashed_key):
+            if self._shares_hasher(cache):
+                if cache._contains_hashed(hashed_key):
+                    return True
+            elif key in cache:
+                return True
+        return False
 
     def __len__(self):
         """Return the length of the cache"""
@@ -711,7 +1820,7 @@ class CacheList:
 
     def __iter__(self):
         """Iterate over all the caches"""
-        return itertools.chain(*iter(self.cache))
+        return itertools.chain.from_iterable(self.caches)
 
     def __setitem__(self, key: Any, item: Any):
         """Add an item to the cache
@@ -720,9 +1829,7 @@ class CacheList:
             key: input key to set
             item: value of the key to set
         """
-        # select a random cache and add the item to the cache
-        cache = random.choice(self.caches)
-        cache.update({key: item})
+        self.update({key: item})
 
     def __call__(self, *args, **kwargs):
         """
@@ -739,8 +1846,17 @@ class CacheList:
             cache.clear(*args, **kwargs)
 
     def update(self, new_cache: Mapping[Any, Any]):
-        cache = random.choice(self.caches)
-        cache.update(new_cache)
+        """Update the caches with new values, each item being routed to a single cache
+
+        Args:
+            new_cache: new cache with items to use to update current cache
+        """
+        shards = [{} for _ in self.caches]
+        for k, v in new_cache.items():
+            shards[self._shard_index(k)][k] = v
+        for cache, shard in zip(self.caches, shards):
+            if len(shard) > 0:
+                cache.update(shard)
 
     def get(self, key, default: Optional[Any] = None):
         """Get the cached value for a specific key
@@ -748,23 +1864,37 @@ class CacheList:
             key: key to get
             default: default value to return when the key is not found
         """
-        for cache in self.caches:
-            val = cache.get(key)
+        hashed_key = self._hash_key(key)
+        for cache in self._lookup_order(hashed_key):
+            if self._shares_hasher(cache):
+                val = cache._get_hashed(hashed_key)
+            else:
+                val = cache.get(key)
             if val is not None:
                 return val
         return default
 
+    def rebalance(self):
+        """Move the items that are not in the cache they are routed to, so that they
+        can be found without scanning all caches.
+        """
+        for i, cache in enumerate(self.caches):
+            misplaced = {k: v for k, v in cache.items() if self._hashed_shard_index(k) != i}
+            if len(misplaced) > 0:
+                cache._delete_hashed(misplaced.keys())
+                self.update(misplaced)
+
     def keys(self):
-        """Get list of keys in the cache"""
-        return list(itertools.chain(*(c.keys() for c in self.caches)))
+        """Return iterator of keys in the cache"""
+        return itertools.chain.from_iterable(c.keys() for c in self.caches)
 
     def values(self):
-        """Get list of values in the cache"""
-        return list(itertools.chain(*(c.values() for c in self.caches)))
+        """Return iterator of values in the cache"""
+        return itertools.chain.from_iterable(c.values() for c in self.caches)
 
     def items(self):
         """Return iterator of key, values in the cache"""
-        return list(itertools.chain(*(c.items() for c in self.caches)))
+        return itertools.chain.from_iterable(c.items() for c in self.caches)
 
     def to_dict(self):
         """Convert current cache to a dictionary"""
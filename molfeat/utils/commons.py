@@ -7,6 +7,7 @@ from typing import List
 from typing import Union
 
 import os
+import base64
 import inspect
 import hashlib
 import pickle
@@ -340,27 +341,33 @@ def pack_graph(
     return new_batch_G, new_batch_x
 
 
-def pack_bits(obj, protocol=4):
+def pack_bits(obj, protocol=4, b64: bool = False):
     """Pack an object into a bits representation
 
     Args:
         obj: object to pack
+        b64: whether to encode the bytes as a base64 string, which can be written as text (e.g. in a csv file)
 
     Returns:
-        bytes: byte-packed version of object
+        bytes: byte-packed version of object, or its base64 string when `b64` is True
     """
-    return pickle.dumps(obj, protocol=protocol)
+    bvalues = pickle.dumps(obj, protocol=protocol)
+    if b64:
+        return base64.b64encode(bvalues).decode("ascii")
+    return bvalues
 
 
 def unpack_bits(bvalues):
     """Pack an object into a bits representation
 
     Args:
-        bvalues: bytes to be unpacked
+        bvalues: bytes to be unpacked, or their base64 string encoding
 
     Returns:
         obj: object that was packed
     """
+    if isinstance(bvalues, str):
+        bvalues = base64.b64decode(bvalues)
     return pickle.loads(bvalues)
 
 
@@ -1,18 +1,24 @@
 import os
 import shutil
+import subprocess
+import sys
 import unittest as ut
+from unittest import mock
 import datamol as dm
 import pandas as pd
 import torch
 import numpy as np
 import shelve
+import pickle
 import tempfile
 import h5py
 import joblib
 from molfeat.utils import datatype
 from molfeat.utils import commons
-from molfeat.utils.cache import CacheList, DataCache
+from molfeat.utils import requires
+from molfeat.utils.cache import CacheList, DataCache, MPDataCache
 from molfeat.utils.cache import FileCache
+from molfeat.utils.cache import MolToKey
 from molfeat.trans.fp import FPVecTransformer
 
 
@@ -86,6 +92,28 @@ class TestCache(ut.TestCase):
         refetched_data = datatype.to_numpy(refetched_data)
         np.testing.assert_array_equal(expected_output, refetched_data)
 
+        # duplicated and already cached inputs are not featurized again
+        new_smiles = ["OCC1CCCCCCCCC1", "NC1CCCCCCCCC1", "OCC1CCCCCCCCC1"]
+        featurizer_spy = mock.MagicMock(side_effect=featurizer, dtype=None)
+        cache(list(smiles_list[:5]) + new_smiles, featurizer_spy)
+        featurizer_spy.assert_called_once()
+        self.assertListEqual(
+            list(featurizer_spy.call_args[0][0]), ["OCC1CCCCCCCCC1", "NC1CCCCCCCCC1"]
+        )
+        # molecules are hashed once per call, and not hashed again by later calls
+        new_cache = DataCache(name="test_hash_once")
+        mols = [dm.to_mol(x) for x in smiles_list[:10]]
+        with mock.patch.object(
+            MolToKey, "batch", autospec=True, side_effect=MolToKey.batch
+        ) as batch_spy:
+            new_cache(list(smiles_list) + mols, featurizer)
+            batch_spy.assert_called_once()
+            self.assertEqual(len(batch_spy.call_args[0][1]), len(smiles_list) + len(mols))
+            refetched_data = datatype.to_numpy(new_cache.fetch(mols + list(smiles_list)))
+            batch_spy.assert_called_once()
+        np.testing.assert_array_equal(refetched_data[10:], expected_output)
+        np.testing.assert_array_equal(refetched_data[:10], expected_output[:10])
+
         # test cache on local storage with shelve
         disk_cache = DataCache(name="test2", cache_file=True, delete_on_exit=True)
         self.assertIsInstance(disk_cache.cache, shelve.Shelf)
@@ -110,11 +138,151 @@ class TestCache(ut.TestCase):
         new_cache = DataCache.load_from_file(save_file)
         self.assertTrue(first_smiles in new_cache)
         np.testing.assert_array_equal(new_cache[first_smiles], first_smiles_val)
+        # compressed files are loaded transparently
+        disk_cache.save_to_file(save_file, compress=("zlib", 3))
+        new_cache = DataCache.load_from_file(save_file)
+        np.testing.assert_array_equal(new_cache[first_smiles], first_smiles_val)
         try:
             os.unlink(save_file)
         except:
             pass
 
+    def test_cache_series_inputs(self):
+        smiles = dm.data.freesolv()["smiles"]
+        featurizer = FPVecTransformer(kind="rdkit", length=10)
+        # series are indexed by label, so inputs must not be looked up by position
+        for series in [smiles.iloc[5:15], smiles.iloc[:20].sample(frac=1, random_state=0)]:
+            expected_output = datatype.to_numpy(featurizer.transform(series.values))
+            cache = DataCache(name="test_series")
+            np.testing.assert_array_equal(
+                datatype.to_numpy(cache(series, featurizer)), expected_output
+            )
+            np.testing.assert_array_equal(datatype.to_numpy(cache.fetch(series)), expected_output)
+            for smi, val in zip(series.values, expected_output):
+                np.testing.assert_array_equal(cache[smi], val)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                file_cache = FileCache(os.path.join(tmp_dir, "cache.pkl"), file_type="pickle")
+                file_cache(series, featurizer)
+                np.testing.assert_array_equal(file_cache.fetch_array(series), expected_output)
+
+    def test_datacache_legacy_pickle(self):
+        cache = DataCache(name="test_legacy")
+        cache.update({"CCO": np.zeros(3)})
+        # caches pickled by older versions miss the attributes added since
+        legacy_state = cache.__getstate__()
+        for name in ["l1_size", "_l1", "backend", "_bloom"]:
+            legacy_state.pop(name)
+        legacy_cache = DataCache.__new__(DataCache)
+        legacy_cache.__setstate__(legacy_state)
+        legacy_cache = pickle.loads(pickle.dumps(legacy_cache))
+        self.assertTrue("CCO" in legacy_cache)
+        np.testing.assert_array_equal(legacy_cache.get("CCO"), np.zeros(3))
+        self.assertListEqual(legacy_cache.fetch(["FAKE"]), [None])
+        self.assertEqual(legacy_cache.backend, "shelve")
+
+    def test_mp_datacache(self):
+        smiles_list = dm.data.freesolv()["smiles"].values[:50]
+        featurizer = FPVecTransformer(kind="rdkit", length=10)
+        expected_output = datatype.to_numpy(featurizer.transform(smiles_list))
+
+        cache = MPDataCache()
+        computed_data = datatype.to_numpy(cache(smiles_list, featurizer))
+        np.testing.assert_array_equal(expected_output, computed_data)
+        self.assertEqual(len(cache), len(smiles_list))
+        self.assertTrue(smiles_list[0] in cache)
+        self.assertFalse("FAKE" in cache)
+        refetched_data = datatype.to_numpy(cache.fetch(smiles_list))
+        np.testing.assert_array_equal(expected_output, refetched_data)
+        self.assertListEqual(cache.fetch(["FAKE"]), [None])
+        # the cache is shared with its copies
+        cache_copy = pickle.loads(pickle.dumps(cache))
+        cache_copy.update({"OCC1CCCCCCCCC1": expected_output[0]})
+        np.testing.assert_array_equal(cache["OCC1CCCCCCCCC1"], expected_output[0])
+        # caches of the same process share a single manager, but not their content
+        other_cache = MPDataCache()
+        self.assertEqual(len(other_cache), 0)
+        self.assertEqual(other_cache.cache._manager.address, cache.cache._manager.address)
+
+    @ut.skipIf(not requires.check("lmdb"), "lmdb is not installed")
+    def test_datacache_lmdb(self):
+        smiles_list = dm.data.freesolv()["smiles"].values[:50]
+        featurizer = FPVecTransformer(kind="rdkit", length=10)
+        expected_output = datatype.to_numpy(featurizer.transform(smiles_list))
+
+        disk_cache = DataCache(
+            name="test_lmdb", cache_file=True, backend="lmdb", delete_on_exit=True
+        )
+        computed_data = datatype.to_numpy(disk_cache(smiles_list, featurizer))
+        np.testing.assert_array_equal(expected_output, computed_data)
+        self.assertEqual(len(disk_cache), len(smiles_list))
+        self.assertTrue(smiles_list[0] in disk_cache)
+        self.assertFalse("FAKE" in disk_cache)
+        np.testing.assert_array_equal(disk_cache[smiles_list[0]], expected_output[0])
+        disk_cache.clear(delete=True)
+
+        with self.assertRaises(ValueError):
+            DataCache(name="test_backend", backend="sqlite")
+
+    def test_datacache_bloom(self):
+        smiles_list = dm.data.freesolv()["smiles"].values[:50]
+        featurizer = FPVecTransformer(kind="rdkit", length=10)
+        expected_output = datatype.to_numpy(featurizer.transform(smiles_list))
+
+        disk_cache = DataCache(name="test_bloom", cache_file=True, delete_on_exit=True)
+        disk_cache(smiles_list[:25], featurizer)
+        # the filter is rebuilt from the keys already on disk
+        disk_cache._sync_cache()
+        disk_cache.cache.close()
+        disk_cache._initialize_cache()
+        with mock.patch.object(
+            shelve.Shelf, "__contains__", autospec=True, side_effect=shelve.Shelf.__contains__
+        ) as contains_spy:
+            self.assertTrue(all(smiles in disk_cache for smiles in smiles_list[:25]))
+            self.assertEqual(contains_spy.call_count, 25)
+            # missing keys are almost never looked up on disk
+            self.assertFalse(any(smiles in disk_cache for smiles in smiles_list[25:]))
+            self.assertLess(contains_spy.call_count, 30)
+        computed_data = datatype.to_numpy(disk_cache(smiles_list, featurizer))
+        np.testing.assert_array_equal(expected_output, computed_data)
+        self.assertTrue(all(smiles in disk_cache for smiles in smiles_list))
+        disk_cache.clear(delete=True)
+
+    def test_datacache_bloom_pickle(self):
+        # string hashes are salted per process, so the filter must not depend on them
+        write_script = "\n".join(
+            [
+                "import pickle, sys, numpy as np",
+                "from molfeat.utils.cache import DataCache",
+                "cache = DataCache(name='test_seed', cache_file=sys.argv[1], clear_on_exit=False)",
+                "cache.update({'CCO': np.zeros(3)})",
+                "cache._sync_cache()",
+                "pickle.dump(cache, open(sys.argv[2], 'wb'))",
+            ]
+        )
+        read_script = "\n".join(
+            [
+                "import pickle, sys",
+                "cache = pickle.load(open(sys.argv[1], 'rb'))",
+                "assert 'CCO' in cache",
+                "assert cache.get('CCO') is not None",
+                "assert cache.fetch(['CCO'])[0] is not None",
+            ]
+        )
+        repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, "cache.db")
+            pickle_file = os.path.join(tmp_dir, "cache.pkl")
+            for seed, args in [
+                ("1", [write_script, cache_file, pickle_file]),
+                ("2", [read_script, pickle_file]),
+            ]:
+                subprocess.run(
+                    [sys.executable, "-c", *args],
+                    check=True,
+                    cwd=repo_dir,
+                    env=dict(os.environ, PYTHONHASHSEED=seed),
+                )
+
     def test_filecache(self):
         mol_data = dm.data.freesolv().iloc[:100]
         # in memory cache
@@ -157,6 +325,12 @@ class TestCache(ut.TestCase):
             self.assertTrue(first_mol in cache)
             self.assertFalse("FAKE" in cache)
             np.testing.assert_array_equal(cache[first_smiles], first_smiles_val)
+            # check updating the loaded values
+            cache.update({"OCC1CCCCCCCCC1": vals[1], "NC1CCCCCCCCC1": [0, 1]})
+            self.assertEqual(len(cache), len(smiles_list) + 2)
+            np.testing.assert_array_equal(cache["OCC1CCCCCCCCC1"], vals[1])
+            self.assertListEqual(cache["NC1CCCCCCCCC1"], [0, 1])
+            np.testing.assert_array_equal(cache[first_smiles], first_smiles_val)
 
         with tempfile.NamedTemporaryFile(delete=True, suffix=".h5") as temp_file:
             with h5py.File(temp_file, "w") as f:
@@ -193,12 +367,126 @@ class TestCache(ut.TestCase):
             np.testing.assert_array_equal(reloaded_cache[first_smiles], first_smiles_val)
             np.testing.assert_array_equal(reloaded_cache_parquet[first_smiles], first_smiles_val)
             np.testing.assert_array_equal(reloaded_cache_csv[first_smiles], first_smiles_val)
-            for path in [parquet_out, csv_out]:
+
+            # hdf5 values are written as rows of a single dataset
+            h5_out = temp_file.name + ".h5"
+            cache.save_to_file(h5_out, file_type="hdf5")
+            with h5py.File(h5_out, "r") as f:
+                # the updated values have a different dtype than the loaded ones
+                self.assertEqual(f["values"].shape[0], 100)
+                self.assertEqual(len(f["others"]), 50)
+            reloaded_cache_h5 = FileCache.load_from_file(h5_out, file_type="hdf5")
+            self.assertEqual(len(reloaded_cache_h5), 150)
+            np.testing.assert_array_equal(reloaded_cache_h5[first_smiles], first_smiles_val)
+            reloaded_cache_h5.update({"OCC1CCCCCCCCC1": first_smiles_val})
+            self.assertEqual(len(reloaded_cache_h5), 151)
+            np.testing.assert_array_equal(reloaded_cache_h5["OCC1CCCCCCCCC1"], first_smiles_val)
+            refetched_data = datatype.to_numpy(reloaded_cache_h5.fetch(smiles_list))
+            np.testing.assert_array_equal(vals, refetched_data)
+            reloaded_cache_h5.clear()
+            # csv values are written as base64 strings
+            packed_value = pd.read_csv(csv_out)["values"].iloc[0]
+            self.assertFalse(packed_value.startswith("b'"))
+            self.assertEqual(len(commons.unpack_bits(packed_value)), len(first_smiles_val))
+            for path in [parquet_out, csv_out, h5_out]:
                 try:
                     os.unlink(path)
                 except:
                     shutil.rmtree(path)
 
+    def test_filecache_hdf5_chunks(self):
+        rng = np.random.default_rng(0)
+        keys = [f"key_{i}" for i in range(5000)]
+        vals = rng.random((len(keys), 300))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = FileCache(os.path.join(tmp_dir, "missing.h5"), file_type="hdf5")
+            cache.update(dict(zip(keys, vals)))
+            h5_out = os.path.join(tmp_dir, "cache.h5")
+            cache.save_to_file(h5_out)
+            with h5py.File(h5_out, "r") as f:
+                self.assertEqual(f["values"].shape, vals.shape)
+                self.assertTrue(f["values"].chunks[0] < len(keys))
+                np.testing.assert_array_equal(f["values"][:], vals)
+            reloaded_cache = FileCache(h5_out, file_type="hdf5")
+            np.testing.assert_array_equal(reloaded_cache.fetch(keys), vals)
+            reloaded_cache.clear()
+
+    def test_filecache_parquet_layout(self):
+        keys = [f"key_{i}" for i in range(100)]
+        vals = np.random.default_rng(0).random((len(keys), 16)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = FileCache(os.path.join(tmp_dir, "missing.parquet"), file_type="parquet")
+            cache.update(dict(zip(keys, vals)))
+            parquet_out = os.path.join(tmp_dir, "cache.parquet")
+            cache.save_to_file(parquet_out)
+            # values are written as fixed size lists that pandas can still read
+            df = pd.read_parquet(parquet_out)
+            np.testing.assert_array_equal(np.stack(df["values"].values), vals)
+            reloaded_cache = FileCache(parquet_out, file_type="parquet")
+            refetched_data = np.stack(reloaded_cache.fetch(keys))
+            self.assertEqual(refetched_data.dtype, np.float32)
+            np.testing.assert_array_equal(refetched_data, vals)
+            # saving the reloaded cache gives the same file content
+            reloaded_cache.save_to_file(parquet_out)
+            reloaded_df = pd.read_parquet(parquet_out)
+            self.assertListEqual(list(reloaded_df["keys"]), keys)
+            np.testing.assert_array_equal(np.stack(reloaded_df["values"].values), vals)
+
+    def test_filecache_csv_formats(self):
+        rng = np.random.default_rng(0)
+        data = {"key_small": rng.random(16), "key_large": rng.random(200_000)}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # values larger than the default csv block size can be loaded back
+            cache = FileCache(os.path.join(tmp_dir, "missing.csv"), file_type="csv")
+            cache.update(data)
+            csv_out = os.path.join(tmp_dir, "cache.csv")
+            cache.save_to_file(csv_out)
+            reloaded_cache = FileCache(csv_out, file_type="csv")
+            for key, val in data.items():
+                np.testing.assert_array_equal(reloaded_cache[key], val)
+
+            # files written by older versions hold the representation of the packed bytes
+            legacy_out = os.path.join(tmp_dir, "legacy.csv")
+            df = pd.DataFrame(
+                [(k, commons.pack_bits(v)) for k, v in data.items()], columns=["keys", "values"]
+            )
+            df.to_csv(legacy_out, index=False)
+            legacy_cache = FileCache(legacy_out, file_type="csv")
+            for key, val in data.items():
+                np.testing.assert_array_equal(legacy_cache[key], val)
+            # and are rewritten in the current format
+            legacy_cache.save_to_file(legacy_out)
+            self.assertFalse(pd.read_csv(legacy_out)["values"].str.startswith("b'").any())
+            np.testing.assert_array_equal(
+                FileCache(legacy_out, file_type="csv")["key_large"], data["key_large"]
+            )
+
+    def test_filecache_fetch_array(self):
+        keys = [f"key_{i}" for i in range(100)]
+        vals = np.random.default_rng(0).random((len(keys), 16)).astype(np.float32)
+        query = keys[10:20][::-1] + ["FAKE"] + keys[:5]
+        expected = np.concatenate([vals[10:20][::-1], np.full((1, 16), np.nan), vals[:5]])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = FileCache(os.path.join(tmp_dir, "missing.pkl"), file_type="pickle")
+            cache.update(dict(zip(keys, vals)))
+            fetched = cache.fetch_array(query)
+            self.assertEqual(fetched.dtype, np.float32)
+            np.testing.assert_array_equal(fetched, expected)
+            with self.assertRaises(ValueError):
+                cache.fetch_array(["FAKE"])
+
+            # values of reloaded files are stored as a single array
+            for file_type in ["pickle", "csv", "hdf5"]:
+                out_file = os.path.join(tmp_dir, f"cache.{file_type}")
+                cache.save_to_file(out_file, file_type=file_type)
+                reloaded_cache = FileCache(out_file, file_type=file_type)
+                np.testing.assert_array_equal(reloaded_cache.fetch_array(query), expected)
+                np.testing.assert_array_equal(reloaded_cache.fetch_array(keys), vals)
+                np.testing.assert_array_equal(
+                    reloaded_cache.fetch_array(["FAKE"], fill_value=0), np.zeros((1, 16))
+                )
+                reloaded_cache.clear()
+
     def test_cache_list(self):
         # Test multiple cache simultaneously
         mol_data = dm.data.freesolv().iloc[:200]
@@ -228,6 +516,150 @@ class TestCache(ut.TestCase):
             # this one should not change
             self.assertTrue(len(cache3) != 0)
 
+    def test_cache_l1(self):
+        smiles_list = dm.data.freesolv()["smiles"].values[:10]
+        vals = np.arange(len(smiles_list) * 3).reshape(len(smiles_list), 3)
+        disk_cache = DataCache(name="test_l1", cache_file=True, delete_on_exit=True, l1_size=4)
+        disk_cache.update(dict(zip(smiles_list, vals)))
+        np.testing.assert_array_equal(disk_cache.fetch(smiles_list), vals)
+        # only the most recently read values are kept in memory
+        self.assertEqual(len(disk_cache._l1), 4)
+        self.assertListEqual(
+            list(disk_cache._l1.keys()), disk_cache.mol_hasher.batch(smiles_list[-4:])
+        )
+        # updated values are not read from the in-memory cache
+        disk_cache[smiles_list[-1]] = vals[0]
+        np.testing.assert_array_equal(disk_cache[smiles_list[-1]], vals[0])
+        # editing a returned value in place does not change later reads
+        for _ in range(2):
+            value = disk_cache[smiles_list[0]]
+            value += 5
+            np.testing.assert_array_equal(disk_cache[smiles_list[0]], vals[0])
+        disk_cache.clear(delete=True)
+
+        # in-memory caches do not need it
+        memory_cache = DataCache(name="test_l1_memory", l1_size=4)
+        memory_cache.update(dict(zip(smiles_list, vals)))
+        np.testing.assert_array_equal(memory_cache.fetch(smiles_list), vals)
+        self.assertEqual(len(memory_cache._l1), 0)
+
+    def test_cache_list_routing(self):
+        smiles_list = dm.data.freesolv()["smiles"].values[:60]
+        featurizer = FPVecTransformer(kind="rdkit", length=10)
+        vals = datatype.to_numpy(featurizer.transform(smiles_list))
+        cache1 = DataCache(name="test_route1")
+        cache2 = DataCache(name="test_route2")
+        cache_merge = CacheList(cache1, cache2)
+        cache_merge.update(dict(zip(smiles_list, vals)))
+        # each item is written once, and always to the same cache
+        self.assertEqual(len(cache_merge), len(smiles_list))
+        self.assertTrue(len(cache1) > 0 and len(cache2) > 0)
+        cache_merge[smiles_list[0]] = vals[0]
+        self.assertEqual(len(cache_merge), len(smiles_list))
+        np.testing.assert_array_equal(cache_merge.fetch(smiles_list), vals)
+        self.assertSetEqual(set(cache_merge), set(cache1.keys()) | set(cache2.keys()))
+        self.assertEqual(len(list(cache_merge.keys())), len(smiles_list))
+        self.assertEqual(len(dict(cache_merge.items())), len(smiles_list))
+        # keys are hashed once per lookup, whether they are found or not
+        with mock.patch.object(
+            MolToKey, "__call__", autospec=True, side_effect=MolToKey.__call__
+        ) as hasher_spy:
+            self.assertIsNotNone(cache_merge.get(smiles_list[0]))
+            self.assertEqual(hasher_spy.call_count, 1)
+            self.assertIsNone(cache_merge.get("CCCCCCCCCCCCCCO"))
+            self.assertEqual(hasher_spy.call_count, 2)
+            self.assertTrue(smiles_list[0] in cache_merge)
+            self.assertFalse("CCCCCCCCCCCCCCO" in cache_merge)
+            self.assertEqual(hasher_spy.call_count, 4)
+
+        # items added directly to a cache are still found and can be moved
+        cache3 = DataCache(name="test_route3", cache_file=True, delete_on_exit=True)
+        cache4 = DataCache(name="test_route4")
+        cache3.update(dict(zip(smiles_list, vals)))
+        cache_merge = CacheList(cache3, cache4)
+        np.testing.assert_array_equal(cache_merge.fetch(smiles_list), vals)
+        cache_merge.rebalance()
+        self.assertEqual(len(cache_merge), len(smiles_list))
+        self.assertTrue(len(cache4) > 0)
+        for smiles, val in zip(smiles_list, vals):
+            routed_cache = cache_merge.caches[cache_merge._shard_index(smiles)]
+            np.testing.assert_array_equal(routed_cache[smiles], val)
+            # moved items are not served anymore from the in-memory cache of their old cache
+            self.assertEqual(smiles in cache3, cache3.get(smiles) is not None)
+        cache3.clear(delete=True)
+
+    def test_mol_hasher_batch(self):
+        smiles_list = dm.data.freesolv()["smiles"].values[:50]
+        hasher = MolToKey("dm.unique_id")
+        expected_ids = [dm.unique_id(x) for x in smiles_list]
+        self.assertListEqual(hasher.batch(smiles_list), expected_ids)
+        self.assertListEqual(hasher.batch(smiles_list, n_jobs=-1), expected_ids)
+        # force the parallel path on a small input
+        with mock.patch.object(MolToKey, "PARALLEL_THRESHOLD", 10):
+            self.assertListEqual(list(hasher.batch(smiles_list, n_jobs=2)), expected_ids)
+
+    def test_mol_hasher_parsing(self):
+        hasher = MolToKey("dm.unique_id")
+        smiles = "CC(=O)Oc1ccccc1C(=O)O"
+        expected_id = dm.unique_id(smiles)
+        with mock.patch.object(dm, "to_mol", wraps=dm.to_mol) as to_mol_spy:
+            # smiles are parsed only once
+            self.assertEqual(hasher(smiles), expected_id)
+            self.assertEqual(to_mol_spy.call_count, 1)
+            # molecules are not parsed at all
+            self.assertEqual(hasher(dm.to_mol(smiles)), expected_id)
+            self.assertEqual(to_mol_spy.call_count, 2)
+        # invalid inputs are returned as is
+        self.assertEqual(hasher("FAKE"), "FAKE")
+        # custom hash functions get the input unchanged
+        self.assertEqual(MolToKey(lambda x: x + "_key")(smiles), smiles + "_key")
+
+    def test_mol_hasher_immutable(self):
+        hasher = MolToKey("dm.unique_id")
+        with self.assertRaises(AttributeError):
+            hasher.hash_fn = dm.to_inchikey
+        with self.assertRaises(AttributeError):
+            hasher.new_attribute = None
+        reloaded_hasher = pickle.loads(pickle.dumps(hasher))
+        self.assertEqual(reloaded_hasher.hash_name, "dm.unique_id")
+        self.assertEqual(reloaded_hasher("CCO"), hasher("CCO"))
+        # caches share the hasher they are given
+        cache = DataCache(name="immutable", mol_hasher=hasher)
+        self.assertIs(cache.mol_hasher, hasher)
+
+    def test_mol_hasher_digest_inputs(self):
+        hasher = MolToKey("dm.unique_id")
+        mol_id = hasher("CCO")
+        inchikey = dm.to_inchikey("CCO")
+        with mock.patch.object(dm, "to_mol", wraps=dm.to_mol) as to_mol_spy:
+            # molecular keys are returned without being parsed
+            self.assertEqual(hasher(mol_id), mol_id)
+            self.assertEqual(hasher(inchikey), inchikey)
+            self.assertEqual(MolToKey(lambda x: x + "_key")(mol_id), mol_id)
+            self.assertEqual(to_mol_spy.call_count, 0)
+        # smiles that look like digests are still hashed
+        for smiles in ["c1ccc2cc3cc4cc5ccccc5cc4cc3cc2c1", "CCCCCCCCCCCCCC-CCCCCCCCCC-C"]:
+            self.assertEqual(hasher(smiles), dm.unique_id(smiles))
+        smiles_list = dm.data.freesolv()["smiles"].values
+        self.assertListEqual(hasher.batch(smiles_list), [dm.unique_id(x) for x in smiles_list])
+
+    def test_mol_hasher_xxh3_missing(self):
+        # the missing dependency is reported when the hasher is created, not on first use
+        with mock.patch.object(requires, "check", return_value=False):
+            with self.assertRaises(ImportError):
+                MolToKey("xxh3")
+
+    @ut.skipIf(not requires.check("xxhash"), "xxhash is not installed")
+    def test_mol_hasher_xxh3(self):
+        hasher = MolToKey("xxh3")
+        smiles = "OCC"
+        key = hasher(smiles)
+        self.assertEqual(len(key), 16)
+        self.assertEqual(key, hasher(dm.to_mol("CCO")))
+        self.assertNotEqual(key, hasher("CCN"))
+        reloaded_hasher = MolToKey.from_state_dict(hasher.to_state_dict())
+        self.assertEqual(reloaded_hasher(smiles), key)
+
     def test_align_conformers(self):
         # Get some molecules
         smiles_list = [